@@ -1,15 +1,23 @@
-import requests
+import aiohttp
+import asyncio
 import sys
-import json
 import argparse
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from requests.exceptions import RequestException, ConnectionError, Timeout
+import re
+import os
+import gzip
+import zlib
+import tempfile
+import time
 from tqdm import tqdm
 from colorama import Fore, Style
-import time
 import subprocess
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 # List of patterns to identify parameters potentially vulnerable to SQLi
 patterns = [
     "id=", "select=", "report=", "role=", "update=", "query=", "user=",
@@ -19,62 +27,360 @@ patterns = [
     "number=", "filter="
 ]
 
+# All patterns combined into one alternation so each URL is scanned once. None
+# without patterns, since an empty alternation would match every URL
+sqli_regex = re.compile('|'.join(re.escape(pattern) for pattern in patterns)) if patterns else None
+
+# A character every pattern contains ('=' for the list above); URLs without it
+# cannot match and are rejected with a single C-level scan. When no character is
+# shared it is '', which every string contains, so the prefilter is turned off
+common_chars = set(patterns[0]).intersection(*patterns[1:]) if patterns else set()
+sqli_prefilter = min(common_chars, default='')
+sqli_prefilter_bytes = sqli_prefilter.encode()
+
+def build_sqli_automaton(patterns):
+    """
+    Builds an Aho-Corasick automaton over the patterns when pyahocorasick is installed.
+
+    Args:
+        patterns (list): The substrings to match.
+
+    Returns:
+        ahocorasick.Automaton: The automaton, or None if pyahocorasick is not available
+        or there are no patterns.
+    """
+    if ahocorasick is None or not patterns:
+        return None
+    automaton = ahocorasick.Automaton()
+    for index, pattern in enumerate(patterns):
+        automaton.add_word(pattern, index)
+    automaton.make_automaton()
+    return automaton
+
+sqli_automaton = build_sqli_automaton(patterns)
+
+# On-disk cache of Wayback CDX results, reused for up to a day
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'sqlihunter')
+CACHE_MAX_AGE = 24 * 60 * 60
+
+# Size of the reads from the Wayback response stream
+CHUNK_SIZE = 1 << 16
+
+# Retries for connection errors and transient HTTP statuses from the Wayback Machine
+MAX_RETRIES = 3
+RETRY_BACKOFF = 2
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
 # Logging configuration
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def waybackfinder(host):
+def get_cache_path(host):
     """
-    Fetches URLs from the Wayback Machine for a given host, including subdomains.
+    Returns the path of the cached Wayback URLs for a host.
 
     Args:
-        host (str): The domain to search for in the Wayback Machine.
+        host (str): The domain the URLs were fetched for.
+
+    Returns:
+        str: The path of the gzip-compressed cache file.
+    """
+    return os.path.join(CACHE_DIR, host.replace(os.sep, '_') + '.txt.gz')
+
+def is_cache_fresh(path):
+    """
+    Checks if a cache file exists and is younger than CACHE_MAX_AGE.
+
+    Args:
+        path (str): The cache file to check.
+
+    Returns:
+        bool: True if the cache file can be reused, False otherwise.
+    """
+    try:
+        return time.time() - os.path.getmtime(path) < CACHE_MAX_AGE
+    except OSError:
+        return False
+
+def read_cache_file(path):
+    """
+    Yields the non-empty lines of a gzip cache file as bytes.
+
+    Args:
+        path (str): The cache file to read.
+
+    Yields:
+        bytes: A URL from the cache file.
+    """
+    with gzip.open(path, 'rb') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+def open_cache_file(host):
+    """
+    Opens a temporary gzip file in CACHE_DIR to tee the Wayback URLs of a host into.
+
+    Args:
+        host (str): The domain the URLs are fetched for.
 
     Returns:
-        list: A list of URLs from the Wayback Machine.
+        tuple: The open gzip file and its path, or (None, None) if it cannot be created.
     """
-    url = f'http://web.archive.org/cdx/search/cdx?url=*.{host}/*&output=json&fl=original&collapse=urlkey'
     try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        results = r.json()
-        return results[1:]
-    except ConnectionError as e:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd, partial_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.part')
+        os.close(fd)
+        return gzip.open(partial_path, 'wb', compresslevel=1), partial_path
+    except OSError as e:
+        logging.warning(f"Cannot cache URLs for {host}: {e}")
+        return None, None
+
+def discard_cache_file(cache_file, partial_path):
+    """
+    Closes and deletes a partial cache file, ignoring errors while doing so.
+
+    Args:
+        cache_file (gzip.GzipFile): The open cache file.
+        partial_path (str): The path of the partial cache file.
+    """
+    try:
+        cache_file.close()
+    except OSError:
+        pass
+    try:
+        os.remove(partial_path)
+    except OSError:
+        pass
+
+async def get_with_retries(session, url, host):
+    """
+    Sends a GET request, retrying connection errors and transient HTTP statuses
+    with exponential backoff. The last attempt's error or status is left to the caller.
+
+    Args:
+        session (aiohttp.ClientSession): The shared HTTP session.
+        url (str): The URL to request.
+        host (str): The domain the request is for, used in log messages.
+
+    Returns:
+        aiohttp.ClientResponse: The response, to be used as an async context manager.
+    """
+    delay = RETRY_BACKOFF
+    for _ in range(MAX_RETRIES):
+        try:
+            r = await session.get(url)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            logging.warning(f"Retrying {host} in {delay}s after error: {e}")
+        else:
+            if r.status not in RETRY_STATUSES:
+                return r
+            r.release()
+            logging.warning(f"Retrying {host} in {delay}s after HTTP {r.status}")
+        await asyncio.sleep(delay)
+        delay *= 2
+    return await session.get(url)
+
+async def waybackfinder(session, host, rate_limit=0, use_cache=True, refresh=False):
+    """
+    Yields URLs from the Wayback Machine for a given host, including subdomains.
+
+    The CDX response is requested as plain text (one URL per line) and streamed
+    line by line, so the whole body is never held in memory. Unless disabled,
+    the URLs are also written to a gzip cache that is reused for a day; an
+    unreadable cache file is deleted and the URLs are fetched again. The rate
+    limit only applies when the Wayback Machine was actually queried.
+
+    Lines without the prefilter character cannot match any pattern, so they are
+    dropped as bytes and only the remaining candidates are decoded.
+
+    Args:
+        session (aiohttp.ClientSession): The shared HTTP session.
+        host (str): The domain to search for in the Wayback Machine.
+        rate_limit (float): The rate limit in seconds between requests.
+        use_cache (bool): Whether to read and write the on-disk cache.
+        refresh (bool): Whether to ignore a cached result and fetch it again.
+
+    Yields:
+        str: A URL from the Wayback Machine.
+    """
+    cache_path = get_cache_path(host)
+    if use_cache and not refresh and is_cache_fresh(cache_path):
+        logging.info(f"Using cached URLs for {host}")
+        cached = read_cache_file(cache_path)
+        while True:
+            # Only reading the cache is guarded, never the consumer of the yielded URLs
+            try:
+                line = next(cached)
+            except StopIteration:
+                return
+            except (OSError, EOFError, zlib.error) as e:
+                logging.warning(f"Discarding unreadable cache for {host}: {e}")
+                try:
+                    os.remove(cache_path)
+                except OSError:
+                    pass
+                break
+            if sqli_prefilter_bytes in line:
+                yield line.decode('utf-8', 'replace')
+
+    url = f'http://web.archive.org/cdx/search/cdx?url=*.{host}/*&fl=original&collapse=urlkey'
+    cache_file = partial_path = None
+    try:
+        async with await get_with_retries(session, url, host) as r:
+            r.raise_for_status()
+            if use_cache:
+                cache_file, partial_path = open_cache_file(host)
+            # Read large chunks and split them ourselves instead of one readline() per URL
+            tail = b''
+            async for chunk in r.content.iter_chunked(CHUNK_SIZE):
+                # Cache the raw bytes as received; only candidate URLs get decoded
+                if cache_file is not None:
+                    try:
+                        cache_file.write(chunk)
+                    except OSError as e:
+                        # A failing cache must never cut the fetch short
+                        logging.warning(f"Cannot cache URLs for {host}: {e}")
+                        discard_cache_file(cache_file, partial_path)
+                        cache_file = partial_path = None
+                lines = (tail + chunk if tail else chunk).split(b'\n')
+                tail = lines.pop()
+                for line in lines:
+                    line = line.strip()
+                    if line and sqli_prefilter_bytes in line:
+                        yield line.decode('utf-8', 'replace')
+            tail = tail.strip()
+            if tail and sqli_prefilter_bytes in tail:
+                yield tail.decode('utf-8', 'replace')
+        if cache_file is not None:
+            cache_file.close()
+            cache_file = None
+            os.replace(partial_path, cache_path)
+    except aiohttp.ClientConnectionError as e:
         logging.error(f"Connection error fetching URLs for {host}: {e}")
-    except Timeout as e:
+    except asyncio.TimeoutError as e:
         logging.error(f"Timeout error fetching URLs for {host}: {e}")
-    except RequestException as e:
+    except aiohttp.ClientError as e:
         logging.error(f"Error fetching URLs for {host}: {e}")
-    except json.JSONDecodeError as e:
-        logging.error(f"Error decoding JSON response for {host}: {e}")
-    return []
+    except OSError as e:
+        logging.error(f"Error caching URLs for {host}: {e}")
+    finally:
+        # Never leave a truncated result behind as if it were complete
+        if cache_file is not None:
+            discard_cache_file(cache_file, partial_path)
+        elif partial_path is not None and os.path.exists(partial_path):
+            try:
+                os.remove(partial_path)
+            except OSError:
+                pass
+    await asyncio.sleep(rate_limit)
+
+def dedup_key(url):
+    """
+    Returns the key used to deduplicate URLs, ignoring the scheme and the fragment.
+
+    Args:
+        url (str): The URL to build the key for.
+
+    Returns:
+        str: The URL without its scheme and fragment.
+    """
+    url = url.partition('#')[0]
+    _, separator, rest = url.partition('://')
+    return rest if separator else url
 
 def check_sqli(endpoint):
     """
     Checks if an endpoint contains any patterns indicating potential SQLi vulnerability.
 
+    URLs without the prefilter character are rejected first. The rest are matched
+    with the Aho-Corasick automaton when available and the combined regex otherwise.
+
     Args:
         endpoint (str): The URL to check for SQLi patterns.
 
     Returns:
         bool: True if any pattern is found, False otherwise.
     """
-    return any(pattern in endpoint for pattern in patterns)
+    if sqli_regex is None or sqli_prefilter not in endpoint:
+        return False
+    if sqli_automaton is not None:
+        return next(sqli_automaton.iter(endpoint), None) is not None
+    return sqli_regex.search(endpoint) is not None
 
-def fetch_urls_for_domain(domain, rate_limit):
+async def fetch_urls_for_domain(session, domain, rate_limit, endpoints, use_cache=True, refresh=False):
     """
-    Fetches URLs for a given domain.
+    Streams the URLs for a given domain and keeps the new ones matching an SQLi pattern.
+
+    Only matching URLs are deduplicated, so URLs that are thrown away never
+    take up memory.
 
     Args:
+        session (aiohttp.ClientSession): The shared HTTP session.
         domain (str): The domain to fetch URLs for.
         rate_limit (float): The rate limit in seconds between requests.
+        endpoints (dict): Potential SQLi endpoints by dedup key, shared by all domains.
+        use_cache (bool): Whether to read and write the on-disk cache.
+        refresh (bool): Whether to ignore a cached result and fetch it again.
+    """
+    logging.info(f"Fetching URLs for domain: {domain}")
+    async for url in waybackfinder(session, domain, rate_limit, use_cache, refresh):
+        if check_sqli(url):
+            endpoints.setdefault(dedup_key(url), url)
+
+async def find_sqli_endpoints(domains, rate_limit, concurrency, width, use_cache=True, refresh=False):
+    """
+    Fetches URLs for all domains concurrently over a single pooled HTTP session
+    and filters them for potential SQLi endpoints as they arrive.
+
+    At most `concurrency` domains are queried at once; a failing domain is
+    logged and does not abort the rest of the batch.
+
+    Args:
+        domains (list): The domains to fetch URLs for.
+        rate_limit (float): The rate limit in seconds between requests.
+        concurrency (int): The maximum number of domains fetched in parallel.
+        width (int): The width of the progress bar.
+        use_cache (bool): Whether to read and write the on-disk cache.
+        refresh (bool): Whether to ignore cached results and fetch them again.
 
     Returns:
-        list: A list of URLs for the domain.
+        list: The unique potential SQLi endpoints found for all domains.
     """
-    logging.info(f"Fetching URLs for domain: {domain}")
-    urls = waybackfinder(domain)
-    time.sleep(rate_limit)
-    return urls
+    endpoints = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=60)
+    connector = aiohttp.TCPConnector(limit=20, ttl_dns_cache=300)
+
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        with tqdm(total=len(domains), desc="Fetching URLs", unit="domain", ncols=width) as progress:
+            async def process(domain):
+                try:
+                    async with semaphore:
+                        await fetch_urls_for_domain(session, domain, rate_limit, endpoints, use_cache, refresh)
+                    print(f"Processed domain: {domain}")
+                finally:
+                    progress.update()
+
+            results = await asyncio.gather(*(process(domain) for domain in domains), return_exceptions=True)
+
+    for domain, result in zip(domains, results):
+        if isinstance(result, Exception):
+            logging.error(f"Error processing domain {domain}: {result}")
+
+    return list(endpoints.values())
+
+def read_domains(lines):
+    """
+    Reads domains from an iterable of lines, skipping blank lines and comments.
+
+    Args:
+        lines (iterable): The lines to read, e.g. an open file or sys.stdin.
+
+    Returns:
+        list: The domains found.
+    """
+    return [domain for line in lines if (domain := line.strip()) and not domain.startswith('#')]
 
 def check_proxychains():
     """
@@ -111,12 +417,20 @@ def main():
     parser.add_argument('-f', '--file', type=str, help='Input file with domains')
     parser.add_argument('-o', '--output', type=str, required=True, help='Output file to save potential SQLi endpoints')
     parser.add_argument('-r', '--rate', type=float, default=0, help='Rate limit in seconds between requests (default: 0). Recommended between 1 and 2 seconds.')
+    parser.add_argument('-c', '--concurrency', type=int, default=5, help='Maximum number of domains fetched in parallel (default: 5)')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the Wayback cache in ~/.cache/sqlihunter')
+    parser.add_argument('--refresh', action='store_true', help='Ignore cached Wayback results and fetch them again')
     parser.add_argument('--use-proxychains', action='store_true', help='Use proxychains for network requests')
     args = parser.parse_args()
 
     input_file = args.file
     output_file = args.output
     rate_limit = args.rate
+    concurrency = args.concurrency
+    if concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    use_cache = not args.no_cache
+    refresh = args.refresh
     use_proxychains = args.use_proxychains
 
     if use_proxychains:
@@ -129,37 +443,19 @@ def main():
 
     if input_file:
         with open(input_file, 'r') as f:
-            domains = f.read().splitlines()
+            domains = read_domains(f)
     else:
         print(Fore.YELLOW + "Reading domains from stdin..." + Style.RESET_ALL)
-        domains = sys.stdin.read().splitlines()
+        domains = read_domains(sys.stdin)
 
-    all_urls = set()
+    width = 50  # Set the width of the progress bar
 
-    print("Processing domains...\n")
+    print("Processing domains and checking for potential SQLi vulnerabilities...\n")
 
-    # Use a ThreadPoolExecutor to parallelize the requests
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = {executor.submit(fetch_urls_for_domain, domain, rate_limit): domain for domain in domains}
-        
-        width = 50  # Set the width of the progress bar
-        for future in tqdm(as_completed(futures), total=len(futures), desc="Fetching URLs", unit="domain", ncols=width):
-            domain = futures[future]
-            try:
-                urls = future.result()
-                for url in urls:
-                    all_urls.add(url[0])
-                print(f"Processed domain: {domain}")
-            except Exception as e:
-                logging.error(f"Error processing domain {domain}: {e}")
-
-    print("\nChecking for potential SQLi vulnerabilities...\n")
-    
-    potential_sqli_endpoints = [url for url in tqdm(all_urls, desc="Checking URLs", unit="url", ncols=width) if check_sqli(url)]
-
-    with open(output_file, 'w') as f:
-        for endpoint in potential_sqli_endpoints:
-            f.write(endpoint + "\n")
+    potential_sqli_endpoints = asyncio.run(find_sqli_endpoints(domains, rate_limit, concurrency, width, use_cache, refresh))
+
+    with open(output_file, 'w', buffering=1 << 20) as f:
+        f.writelines(f"{endpoint}\n" for endpoint in potential_sqli_endpoints)
 
     logging.info(f"Potential SQLi endpoints saved to {output_file}")
 